@@ -1,40 +1,126 @@
 import os
-import json
+import asyncio
+import functools
+import orjson
 import uvicorn
 import re
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+import numpy as np
+from numba import njit
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from typing import List, Dict, Any
+import logging
 
 # --- LangChain and Gemini Imports ---
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_structured_chat_agent
-from langchain.tools import StructuredTool
-from langchain_core.prompts import PromptTemplate
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from twilio.rest import Client
 
 # Load environment variables from the root .env file
 load_dotenv()
 
+# Tool-call tracing goes through logging at DEBUG so it costs nothing in
+# production; export LOGIA_VERBOSE=1 to see it.
+logger = logging.getLogger(__name__)
+if os.environ.get("LOGIA_VERBOSE") == "1":
+    logging.basicConfig(level=logging.DEBUG)
+
 # ==============================================================================
 # 1. SIMULATED DATABASE AND TOOLS
 # ==============================================================================
+# Module-level cache so each tool call doesn't re-read and re-parse the same
+# file. The agent chains 4-5 tool calls per scenario; without this, every one
+# of them pays a disk read + json.load for data that almost never changes.
+# Alongside the raw dict we keep reverse indexes (NumPy arrays of pending-order
+# locations) so the nearest-order search is a C-level vector op, not a Python
+# loop over every order.
+_DATA_CACHE = {
+    "mtime": None,
+    "data": None,
+    "pending_locs": None,          # int64 merchant location per pending order, sorted ascending
+    "pending_order_ids": None,     # order id per pending order, in location order
+    "pending_merchant_ids": None,  # merchant id per pending order, in location order
+    "normal_locs": None,           # int64 location per non-overloaded merchant
+    "normal_ids": None,            # merchant id per non-overloaded merchant
+}
+
+@njit('i8(i8[::1], i8, i8, b1[::1])', fastmath=True, cache=True)
+def _nearest_sorted_idx(locs, start, target, mask):
+    """Returns the index of the unmasked sorted location closest to target, or -1.
+
+    `start` is the searchsorted insertion point for target, so the scan only
+    walks outward until the first valid neighbour on each side — O(log N)
+    overall instead of a full pass. Signature-typed so Numba compiles at
+    import time and caches the binary to disk.
+    """
+    n = locs.shape[0]
+    left = start - 1
+    right = start
+    while left >= 0 and not mask[left]:
+        left -= 1
+    while right < n and not mask[right]:
+        right += 1
+    if left < 0 and right >= n:
+        return -1
+    if left < 0:
+        return right
+    if right >= n:
+        return left
+    return left if (target - locs[left]) <= (locs[right] - target) else right
+
+# Pre-warm the kernel at import so the first MCP request never pays JIT/cache
+# load latency — this is a long-running server, so compile cost belongs at boot.
+_nearest_sorted_idx(np.zeros(1, dtype=np.int64), 0, 0, np.zeros(1, dtype=np.bool_))
+
+def _build_pending_index(data):
+    """Builds the (location, merchant_id, order_id) arrays for pending orders."""
+    locs, order_ids, merchant_ids = [], [], []
+    restaurants = data.get("restaurants", {})
+    for order_id, order in data.get("orders", {}).items():
+        if order.get("status") != "Awaiting Pickup":
+            continue
+        merchant = restaurants.get(order.get("merchant_id"))
+        if not merchant:
+            continue
+        locs.append(merchant.get("location", 0))
+        order_ids.append(order_id)
+        merchant_ids.append(order.get("merchant_id"))
+    # Stored sorted by location so lookups can binary-search instead of scan.
+    locs_arr = np.asarray(locs, dtype=np.int64)
+    order = np.argsort(locs_arr, kind="stable")
+    _DATA_CACHE["pending_locs"] = np.ascontiguousarray(locs_arr[order])
+    _DATA_CACHE["pending_order_ids"] = np.asarray(order_ids, dtype=object)[order]
+    _DATA_CACHE["pending_merchant_ids"] = np.asarray(merchant_ids, dtype=object)[order]
+
+    # Non-overloaded merchants, used by get_nearby_merchants for top-k selection.
+    normal = [(m.get("location", 0), mid) for mid, m in restaurants.items() if m.get("status") == "Normal"]
+    _DATA_CACHE["normal_locs"] = np.asarray([n[0] for n in normal], dtype=np.int64)
+    _DATA_CACHE["normal_ids"] = np.asarray([n[1] for n in normal], dtype=object)
+
 def load_system_data():
-    """Loads the system_data.json file from the project's root directory."""
+    """Loads the system_data.json file from the project's root directory.
+
+    The parsed data is cached and only re-read when the file's mtime changes,
+    so repeated tool calls within one scenario are just a dict lookup.
+    """
     try:
         script_dir = os.path.dirname(__file__)
         json_path = os.path.join(script_dir, "..", "system_data.json")
-        with open(json_path, 'r') as f:
-            return json.load(f)
+        mtime = os.stat(json_path).st_mtime_ns
+        if _DATA_CACHE["mtime"] != mtime:
+            with open(json_path, 'rb') as f:
+                _DATA_CACHE["data"] = orjson.loads(f.read())
+            _build_pending_index(_DATA_CACHE["data"])
+            _DATA_CACHE["mtime"] = mtime
+        return _DATA_CACHE["data"]
     except FileNotFoundError:
         print("🔥 system_data.json not found in the root directory!")
         return {}
 
 def get_order_details(order_id: str) -> str:
     """Gets all details for a specific order ID, including the driver's current location."""
-    print(f"--- TOOL CALLED: get_order_details ---")
+    logger.debug("--- TOOL CALLED: get_order_details ---")
     data = load_system_data()
     order = data.get("orders", {}).get(order_id)
     if not order:
@@ -48,7 +134,7 @@ def get_order_details(order_id: str) -> str:
 
 def get_merchant_details(merchant_id: str) -> str:
     """Gets details for a specific merchant ID, like name, location, and prep time."""
-    print(f"--- TOOL CALLED: get_merchant_details ---")
+    logger.debug("--- TOOL CALLED: get_merchant_details ---")
     data = load_system_data()
     merchant = data.get("restaurants", {}).get(merchant_id)
     if not merchant:
@@ -57,34 +143,30 @@ def get_merchant_details(merchant_id: str) -> str:
     
 def find_nearest_pending_order(driver_location: int, current_merchant_id: str) -> str:
     """Finds the nearest available order for a driver, excluding the current merchant."""
-    print(f"--- TOOL CALLED: find_nearest_pending_order ---")
+    logger.debug("--- TOOL CALLED: find_nearest_pending_order ---")
     data = load_system_data()
-    pending_orders = {oid: o for oid, o in data.get("orders", {}).items() if o.get("status") == "Awaiting Pickup"}
-    if not pending_orders:
+    locs = _DATA_CACHE["pending_locs"]
+    if locs is None or locs.size == 0:
         return "No other pending orders available for rerouting."
-    
-    nearest_order_id = None
-    min_distance = float('inf')
-
-    for order_id, order in pending_orders.items():
-        merchant_id = order.get("merchant_id")
-        if merchant_id != current_merchant_id:
-            merchant = data.get("restaurants", {}).get(merchant_id)
-            if merchant:
-                distance = abs(merchant.get("location", 0) - driver_location)
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_order_id = order_id
-    
-    if nearest_order_id:
-        new_merchant = data.get("restaurants", {}).get(pending_orders[nearest_order_id]['merchant_id'])
-        return f"Found nearest pending order: {nearest_order_id} at {new_merchant.get('name')}, {min_distance} units away."
-    
-    return "No suitable nearby order could be found that is not at the current merchant."
+
+    # Nearest-neighbour search over the sorted index: binary-search for the
+    # insertion point, then the jitted kernel walks outward past entries at
+    # the current merchant until it finds the closest valid candidate.
+    mask = np.ascontiguousarray(_DATA_CACHE["pending_merchant_ids"] != current_merchant_id)
+    start = int(np.searchsorted(locs, driver_location))
+    idx = int(_nearest_sorted_idx(locs, start, int(driver_location), mask))
+    if idx < 0:
+        return "No suitable nearby order could be found that is not at the current merchant."
+    min_distance = int(abs(int(locs[idx]) - driver_location))
+    nearest_order_id = _DATA_CACHE["pending_order_ids"][idx]
+    nearest_merchant_id = _DATA_CACHE["pending_merchant_ids"][idx]
+
+    new_merchant = data.get("restaurants", {}).get(nearest_merchant_id, {})
+    return f"Found nearest pending order: {nearest_order_id} at {new_merchant.get('name')}, {min_distance} units away."
 
 def get_nearby_merchants(current_merchant_id: str) -> str:
     """Finds similar, nearby restaurants that are not overloaded to suggest to a customer."""
-    print(f"--- TOOL CALLED: get_nearby_merchants ---")
+    logger.debug("--- TOOL CALLED: get_nearby_merchants ---")
     data = load_system_data()
     all_merchants = data.get("restaurants", {})
     
@@ -93,93 +175,202 @@ def get_nearby_merchants(current_merchant_id: str) -> str:
         return "Error: Could not find the current merchant to search near."
     current_location = current_merchant.get("location")
 
-    alternatives = []
-    for merchant_id, merchant in all_merchants.items():
-        if merchant_id != current_merchant_id and merchant.get("status") == "Normal":
-            alternatives.append(merchant)
-    
-    alternatives.sort(key=lambda x: abs(x.get("location", 0) - current_location))
-    
-    if not alternatives:
+    # Top-2 selection over the precomputed normal-merchant arrays: O(N)
+    # argpartition instead of a full Python sort with per-element dict lookups.
+    locs = _DATA_CACHE["normal_locs"]
+    ids = _DATA_CACHE["normal_ids"]
+    mask = ids != current_merchant_id
+    candidate_locs, candidate_ids = locs[mask], ids[mask]
+    if candidate_locs.size == 0:
         return "No suitable, non-overloaded alternative merchants found nearby."
-    
-    return str([{"name": m.get("name"), "prep_time": m.get("prep_time_mins")} for m in alternatives[:2]])
 
-def notify_via_twilio(message: str) -> str:
+    d = np.abs(candidate_locs - current_location)
+    if d.size > 2:
+        top = np.argpartition(d, 2)[:2]
+    else:
+        top = np.arange(d.size)
+    top = top[np.argsort(d[top])]
+
+    alternatives = [all_merchants[candidate_ids[i]] for i in top]
+    return orjson.dumps([{"name": m.get("name"), "prep_time": m.get("prep_time_mins")} for m in alternatives]).decode()
+
+# Process-wide singletons for the external clients, created lazily on first
+# use. Reconstructing these per call throws away their HTTP connection pools
+# (a TLS handshake per SMS / LLM call).
+@functools.cache
+def _twilio_client():
+    return Client(os.environ.get("TWILIO_ACCOUNT_SID"), os.environ.get("TWILIO_AUTH_TOKEN"))
+
+@functools.cache
+def _llm():
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=os.environ.get("GEMINI_API_KEY"), temperature=0.0)
+
+async def notify_via_twilio(message: str) -> str:
     """Sends a notification message via Twilio SMS."""
-    print(f"--- TOOL CALLED: notify_via_twilio ---")
+    logger.debug("--- TOOL CALLED: notify_via_twilio ---")
     try:
         account_sid, auth_token, twilio_phone, your_phone = (os.environ.get(k) for k in ["TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_PHONE_NUMBER", "YOUR_PHONE_NUMBER"])
         if not all([account_sid, auth_token, twilio_phone, your_phone]):
             return "Twilio credentials are not fully configured."
-        client = Client(account_sid, auth_token)
-        sms = client.messages.create(body=f"[LOGIA Alert] {message}", from_=twilio_phone, to=your_phone)
+        client = _twilio_client()
+        # The Twilio SDK call is a blocking HTTPS POST — run it on a worker
+        # thread so it doesn't stall the uvicorn event loop.
+        sms = await asyncio.to_thread(client.messages.create, body=f"[LOGIA Alert] {message}", from_=twilio_phone, to=your_phone)
         return "Notification successfully sent."
     except Exception as e:
         return f"Error sending notification: {e}"
 
 # --- Pydantic models for structured tool inputs ---
+# frozen + extra="forbid" keeps validation on Pydantic v2's cheap strict path
+# (no "allow extras" bookkeeping, hashable instances).
 class GetOrderInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
     order_id: str = Field(description="The ID of the order to get details for.")
 class GetMerchantInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
     merchant_id: str = Field(description="The ID of the merchant to get details for.")
 class FindOrderInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
     driver_location: int = Field(description="The current linear coordinate of the driver.")
     current_merchant_id: str = Field(description="The ID of the current merchant to exclude from the search.")
 class GetNearbyInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
     current_merchant_id: str = Field(description="The ID of the current merchant to search near.")
 class NotifyInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
     message: str = Field(description="The message to send.")
 
+# TypeAdapters are built once at import so per-call validation skips schema
+# construction entirely.
+_ADAPTERS = {cls: TypeAdapter(cls) for cls in [GetOrderInput, GetMerchantInput, FindOrderInput, GetNearbyInput, NotifyInput]}
+
 # ==============================================================================
-# 2. SETUP THE RELIABLE LANGCHAIN AGENT
+# 2. SETUP THE DETERMINISTIC PIPELINE AGENT
 # ==============================================================================
+# The old ReAct loop paid a Gemini round trip per step even though the plan is
+# fixed (order -> merchant -> 40-minute rule -> notifications). The pipeline
+# below runs the plan directly in Python: the LLM is only consulted to pull the
+# order ID out of the scenario (when regex can't) and to word the final summary.
+_ORDER_ID_RE = re.compile(r"\bORD-\d+\b", re.IGNORECASE)
+
+class _LLMBatcher:
+    """Coalesces concurrent LLM prompts into a single batched Gemini call.
+
+    When several MCP `tools/call` requests arrive at once, each would otherwise
+    fire its own Gemini round trip. Prompts queued within a ~20 ms window are
+    sent together via `llm.abatch`, amortizing the per-call overhead.
+    """
+    def __init__(self, llm, max_batch: int = 8, window_s: float = 0.02):
+        self.llm = llm
+        self.max_batch = max_batch
+        self.window_s = window_s
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker = None
+
+    async def invoke(self, prompt: str):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        while not self._queue.empty():
+            await asyncio.sleep(self.window_s)  # let a burst accumulate
+            prompts, futures = [], []
+            while not self._queue.empty() and len(prompts) < self.max_batch:
+                prompt, future = self._queue.get_nowait()
+                prompts.append(prompt)
+                futures.append(future)
+            if not prompts:
+                return
+            try:
+                results = await self.llm.abatch(prompts)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
 class LangChainFoodAgent:
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=os.environ.get("GEMINI_API_KEY"), temperature=0.0)
-        
-        # --- Using StructuredTool for robust, multi-argument tool calls ---
-        tools = [
-            StructuredTool.from_function(func=get_order_details, name="get_order_details", args_schema=GetOrderInput),
-            StructuredTool.from_function(func=get_merchant_details, name="get_merchant_details", args_schema=GetMerchantInput),
-            StructuredTool.from_function(func=find_nearest_pending_order, name="find_nearest_pending_order", args_schema=FindOrderInput),
-            StructuredTool.from_function(func=get_nearby_merchants, name="get_nearby_merchants", args_schema=GetNearbyInput),
-            StructuredTool.from_function(func=notify_via_twilio, name="notify_via_twilio", args_schema=NotifyInput),
-        ]
-
-        prompt_template = """You are LOGIA, an autonomous logistics coordinator. Your goal is to proactively resolve delivery disruptions by following a strict, mandatory plan.
-
-        You have access to the following tools:
-        {tools}
-
-        You MUST respond in a JSON blob with an "action" and "action_input". Valid "action" values are "Final Answer" or one of [{tool_names}].
-
-        **Your Mandatory Plan:**
-        1.  FIRST, use `get_order_details` to get the `merchant_id` and driver's `driver_current_location`.
-        2.  SECOND, use `get_merchant_details` with the `merchant_id`.
-        3.  THIRD, analyze the prep time and apply the '40-minute rule':
-            - **IF prep time > 40 mins (Critical Delay):**
-                a. Use `find_nearest_pending_order` with the driver's location and current merchant ID.
-                b. Use `get_nearby_merchants` with the current merchant ID.
-                c. Use `notify_via_twilio` to inform the DRIVER of their new task. The message MUST be specific.
-                d. Use `notify_via_twilio` to inform the CUSTOMER of the delay and include the alternative restaurants you found.
-            - **IF prep time <= 40 mins (Minor Delay):**
-                a. ONLY use `notify_via_twilio` to inform the CUSTOMER of the wait time.
-        4.  FINALLY, provide a "Final Answer" summarizing all actions taken.
-
-        The user's request is as follows:
-        {input}
-        
-        {agent_scratchpad}
-        """
-        prompt = PromptTemplate.from_template(prompt_template)
-        agent = create_structured_chat_agent(self.llm, tools, prompt)
-        self.agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+        self.llm = _llm()
+        self.batcher = _LLMBatcher(self.llm)
+
+    async def _extract_order_id(self, scenario: str) -> str:
+        """Pulls the order ID from the scenario — regex first, LLM fallback."""
+        match = _ORDER_ID_RE.search(scenario)
+        if match:
+            return match.group(0).upper()
+        prompt = (
+            "Extract the order ID (format ORD-<number>) from this request. "
+            "Reply with the order ID only, or NONE if there isn't one.\n"
+            f"Request: {scenario}"
+        )
+        ai_message = await self.batcher.invoke(prompt)
+        content = (getattr(ai_message, "content", "") or "").strip()
+        match = _ORDER_ID_RE.search(content)
+        return match.group(0).upper() if match else ""
 
     async def run(self, scenario: str) -> str:
         try:
-            response = await self.agent_executor.ainvoke({"input": scenario})
-            return response.get("output", "No output generated.")
+            order_id = await self._extract_order_id(scenario)
+            if not order_id:
+                return "Could not identify an order ID (ORD-...) in the request."
+
+            data = load_system_data()
+            order = data.get("orders", {}).get(order_id)
+            if not order:
+                return f"Error: Order ID '{order_id}' not found."
+            merchant_id = order.get("merchant_id")
+            driver_location = data.get("drivers", {}).get(order.get("driver_id"), {}).get("current_location", 0)
+            merchant = data.get("restaurants", {}).get(merchant_id, {})
+            prep_time = merchant.get("prep_time_mins", 0)
+
+            actions_taken = []
+            if prep_time > 40:
+                # Critical delay: find the driver a new task and alternative
+                # restaurants for the customer — both lookups are independent,
+                # so run them concurrently off the event loop.
+                find_args = _ADAPTERS[FindOrderInput].validate_python(
+                    {"driver_location": driver_location, "current_merchant_id": merchant_id}
+                )
+                nearby_args = _ADAPTERS[GetNearbyInput].validate_python({"current_merchant_id": merchant_id})
+                reroute_text, alternatives_text = await asyncio.gather(
+                    asyncio.to_thread(find_nearest_pending_order, find_args.driver_location, find_args.current_merchant_id),
+                    asyncio.to_thread(get_nearby_merchants, nearby_args.current_merchant_id),
+                )
+                driver_message = f"Order {order_id} at {merchant.get('name')} is delayed ({prep_time} mins prep). {reroute_text}"
+                customer_message = (
+                    f"Your order {order_id} at {merchant.get('name')} is facing a critical delay "
+                    f"({prep_time} mins prep time). Nearby alternatives: {alternatives_text}"
+                )
+                # The two notifications are independent side effects — fire both at once.
+                driver_notify, customer_notify = await asyncio.gather(
+                    notify_via_twilio(driver_message),
+                    notify_via_twilio(customer_message),
+                )
+                actions_taken += [
+                    f"Driver reroute: {reroute_text}",
+                    f"Driver notification: {driver_notify}",
+                    f"Customer notification (with alternatives {alternatives_text}): {customer_notify}",
+                ]
+            else:
+                customer_notify = await notify_via_twilio(
+                    f"Your order {order_id} at {merchant.get('name')} is running about {prep_time} mins behind. Thanks for your patience!"
+                )
+                actions_taken.append(f"Customer notification (minor delay, {prep_time} mins): {customer_notify}")
+
+            summary_prompt = (
+                "You are LOGIA, an autonomous logistics coordinator. Summarize the actions below "
+                "into a short, friendly final answer for the dispatcher.\n"
+                f"Scenario: {scenario}\nActions taken:\n- " + "\n- ".join(actions_taken)
+            )
+            summary_message = await self.llm.ainvoke(summary_prompt)
+            return getattr(summary_message, "content", "") or "\n".join(actions_taken)
         except Exception as e:
             return f"🔥🔥🔥 AGENT EXECUTION FAILED 🔥🔥🔥\nError: {e}"
 
@@ -204,13 +395,18 @@ class FoodDelayMCP_Server:
         if method == "initialize": result = self.mcp_initialize(params)
         elif method == "tools/list": result = self.mcp_tools_list(params)
         elif method == "tools/call": result = await self.mcp_tools_call(params)
-        return JSONResponse({"jsonrpc": "2.0", "id": request_id, "result": result})
+        # Serialize the envelope ourselves and return raw bytes — this skips
+        # FastAPI's response-model/jsonable_encoder reflection on the hot path.
+        payload = orjson.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+        return Response(content=payload, media_type="application/json")
 
 # --- Main Application Setup ---
 if __name__ == "__main__":
     print("🍔 LOGIA Food Delay Agent (MCP Server) Starting...")
     mcp_server = FoodDelayMCP_Server()
-    app = FastAPI(title="LOGIA Food Delay Agent")
+    app = FastAPI(title="LOGIA Food Delay Agent", default_response_class=ORJSONResponse)
     @app.post("/")
     async def rpc_endpoint(request: Request): return await mcp_server.handle_rpc_request(request)
-    uvicorn.run(app, host="127.0.0.1", port=8002)
\ No newline at end of file
+    # uvloop + httptools roughly double asyncio throughput for IO-bound
+    # servers; access logging off keeps per-request stdout I/O out of the loop.
+    uvicorn.run(app, host="127.0.0.1", port=8002, loop="uvloop", http="httptools", access_log=False, log_level="warning")
\ No newline at end of file
@@ -1,13 +1,17 @@
 import os
+import asyncio
+import functools
 import uvicorn
-import googlemaps
+import httpx
 import re
-import json
-import ast
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+import orjson
+import numpy as np
+from cachetools import TTLCache
+from collections import defaultdict
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
-from twilio.rest import Client
+import logging
 # --- LangChain and Gemini Imports ---
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import AgentExecutor, create_structured_chat_agent
@@ -18,41 +22,136 @@ from pydantic import BaseModel, Field
 # Load environment variables from the root .env file
 load_dotenv()
 
+# Tool-call tracing goes through logging at DEBUG so it costs nothing in
+# production; export LOGIA_VERBOSE=1 to see it.
+logger = logging.getLogger(__name__)
+_VERBOSE = os.environ.get("LOGIA_VERBOSE") == "1"
+if _VERBOSE:
+    logging.basicConfig(level=logging.DEBUG)
+
+# Regexes used in per-request hot paths, compiled once at import time.
+_DIST_RE = re.compile(r"Distance:\s*([^\.]+)")
+_DUR_RE = re.compile(r"ETA:\s*([^\.]+)")
+_JSON_RE = re.compile(r"\{[\s\S]*\}")
+
+def _leading_float(s: str) -> float:
+    """Parses the leading number from strings like '5.2 km' without the regex engine."""
+    s = s.lstrip()
+    i, n = 0, len(s)
+    while i < n and (s[i].isdigit() or s[i] == '.'):
+        i += 1
+    return float(s[:i])  # raises ValueError when there's no number, like the old parser
+
 # ==============================================================================
 # 1. SETUP THE REAL-WORLD TOOLS
 # ==============================================================================
-gmaps = googlemaps.Client(key=os.environ.get("GOOGLE_MAPS_API_KEY"))
+@functools.cache
+def _llm():
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=os.environ.get("GEMINI_API_KEY"), temperature=0.0)
+
+# Google Maps and Twilio both boil down to a handful of HTTPS endpoints, so the
+# tools call their REST APIs directly through one shared async client. One
+# client means one warm connection pool (HTTP/2 keepalive) across all tools —
+# no per-call TCP/TLS handshakes, and nothing blocks the event loop.
+_HTTP: httpx.AsyncClient | None = None
+
+def _http() -> httpx.AsyncClient:
+    global _HTTP
+    if _HTTP is None:
+        _HTTP = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20),
+        )
+    return _HTTP
+
+async def _close_http():
+    global _HTTP
+    if _HTTP is not None:
+        await _HTTP.aclose()
+        _HTTP = None
+
+_MAPS_BASE = "https://maps.googleapis.com/maps/api"
+
+# Location hints repeat heavily ("Times Square", a district name), so geocoding
+# results are cached for a day and nearby-places lookups for 10 minutes (keyed
+# on a ~100 m lat/lng grid). A per-key lock stops a burst of identical requests
+# from stampeding the Maps API on a cold cache.
+_GEO_CACHE = TTLCache(maxsize=4096, ttl=86400)
+_PLACES_CACHE = TTLCache(maxsize=4096, ttl=600)
+_CACHE_LOCKS = defaultdict(asyncio.Lock)
 
-def find_alternative_destinations(query: str, location_hint: str) -> str:
-    """Finds real, nearby places based on a text query and a text-based location hint."""
-    print(f"--- TOOL CALLED: find_alternative_destinations(query='{query}', location_hint='{location_hint}') ---")
+async def _geocode(location_hint: str, api_key: str):
+    """Resolves a location hint to (lat, lng), with TTL caching."""
+    if location_hint in _GEO_CACHE:
+        return _GEO_CACHE[location_hint]
+    async with _CACHE_LOCKS[("geo", location_hint)]:
+        if location_hint in _GEO_CACHE:  # populated while we waited for the lock
+            return _GEO_CACHE[location_hint]
+        resp = await _http().get(f"{_MAPS_BASE}/geocode/json", params={"address": location_hint, "key": api_key})
+        results = resp.json().get("results", [])
+        if not results:
+            return None
+        location = results[0]['geometry']['location']
+        _GEO_CACHE[location_hint] = (location['lat'], location['lng'])
+        return _GEO_CACHE[location_hint]
+
+async def _places_nearby(query: str, lat: float, lng: float, api_key: str) -> list[dict]:
+    """Nearby-places search, cached on (query, ~100 m grid cell)."""
+    cache_key = (query, round(lat, 3), round(lng, 3))
+    if cache_key in _PLACES_CACHE:
+        return _PLACES_CACHE[cache_key]
+    async with _CACHE_LOCKS[("places", cache_key)]:
+        if cache_key in _PLACES_CACHE:
+            return _PLACES_CACHE[cache_key]
+        resp = await _http().get(
+            f"{_MAPS_BASE}/place/nearbysearch/json",
+            params={"location": f"{lat},{lng}", "keyword": query, "rankby": "distance", "key": api_key},
+        )
+        places = [{"name": p.get('name'), "address": p.get('vicinity'), "rating": p.get('rating', 'N/A')} for p in resp.json().get('results', [])[:3]]
+        _PLACES_CACHE[cache_key] = places
+        return places
+
+async def find_alternative_destinations(query: str, location_hint: str) -> list[dict]:
+    """Finds real, nearby places based on a text query and a text-based location hint.
+
+    Returns the places as a list of dicts directly — the caller is in-process,
+    so there's no reason to stringify and re-parse the results.
+    """
+    logger.debug("--- TOOL CALLED: find_alternative_destinations(query='%s', location_hint='%s') ---", query, location_hint)
     try:
-        geocode_result = gmaps.geocode(location_hint)
-        if not geocode_result: return f"Error: Could not find coordinates for '{location_hint}'."
-        lat, lng = geocode_result[0]['geometry']['location']['lat'], geocode_result[0]['geometry']['location']['lng']
-        places_result = gmaps.places_nearby(location=(lat, lng), keyword=query, rank_by='distance')
-        if not places_result.get('results'): return "No alternative destinations found nearby."
-        top_results = [{"name": p.get('name'), "address": p.get('vicinity'), "rating": p.get('rating', 'N/A')} for p in places_result['results'][:3]]
-        return str(top_results)
-    except Exception as e: return f"Error using Google Maps APIs: {e}"
-
-def get_new_route_details(origin_hint: str, destination_address: str) -> str:
+        api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+        coords = await _geocode(location_hint, api_key)
+        if not coords:
+            logger.warning("🔥 Could not find coordinates for '%s'.", location_hint)
+            return []
+        lat, lng = coords
+        return await _places_nearby(query, lat, lng, api_key)
+    except Exception as e:
+        logger.warning("🔥 Error using Google Maps APIs: %s", e)
+        return []
+
+async def get_new_route_details(origin_hint: str, destination_address: str) -> str:
     """Calculates the new route, distance, and ETA using the Directions API."""
-    print(f"--- TOOL CALLED: get_new_route_details(origin_hint='{origin_hint}', destination_address='{destination_address}') ---")
+    logger.debug("--- TOOL CALLED: get_new_route_details(origin_hint='%s', destination_address='%s') ---", origin_hint, destination_address)
     try:
-        directions_result = gmaps.directions(origin_hint, destination_address, mode="driving")
-        if not directions_result: return "Error: Could not calculate a route."
-        leg = directions_result[0]['legs'][0]
+        resp = await _http().get(
+            f"{_MAPS_BASE}/directions/json",
+            params={"origin": origin_hint, "destination": destination_address, "mode": "driving", "key": os.environ.get("GOOGLE_MAPS_API_KEY")},
+        )
+        routes = resp.json().get("routes", [])
+        if not routes: return "Error: Could not calculate a route."
+        leg = routes[0]['legs'][0]
         return f"New route found. Distance: {leg['distance']['text']}. ETA: {leg['duration']['text']}."
     except Exception as e: return f"Error using Directions API: {e}"
 
 # Add this new tool function
 def calculate_new_fare(distance_text: str, duration_text: str) -> str:
     """Calculates a simulated new fare based on distance and duration text."""
-    print(f"--- TOOL CALLED: calculate_new_fare(distance_text='{distance_text}', duration_text='{duration_text}') ---")
+    logger.debug("--- TOOL CALLED: calculate_new_fare(distance_text='%s', duration_text='%s') ---", distance_text, duration_text)
     try:
-        distance_km = float(re.findall(r"[\d\.]+", distance_text)[0])
-        duration_min = float(re.findall(r"[\d\.]+", duration_text)[0])
+        distance_km = _leading_float(distance_text)
+        duration_min = _leading_float(duration_text)
         # Formula: Base fare + $2/km + $0.5/min (example rates)
         new_fare = 2.50 + (2 * distance_km) + (0.5 * duration_min)
         return f"The estimated new fare for the updated trip is ${new_fare:.2f}."
@@ -60,9 +159,9 @@ def calculate_new_fare(distance_text: str, duration_text: str) -> str:
         return "Could not calculate the new fare."
 
 # Add this new tool function
-def notify_passenger_via_twilio(message: str) -> str:
+async def notify_passenger_via_twilio(message: str) -> str:
     """Sends a final notification to the passenger via Twilio SMS."""
-    print(f"--- TOOL CALLED: notify_passenger_via_twilio(message='{message}') ---")
+    logger.debug("--- TOOL CALLED: notify_passenger_via_twilio(message='%s') ---", message)
     try:
         account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
         auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -70,11 +169,15 @@ def notify_passenger_via_twilio(message: str) -> str:
         your_phone = os.environ.get("YOUR_PHONE_NUMBER")
         if not all([account_sid, auth_token, twilio_phone, your_phone]):
             return "Twilio credentials are not fully configured."
-        client = Client(account_sid, auth_token)
-        sms = client.messages.create(body=f"[LOGIA Reroute] {message}", from_=twilio_phone, to=your_phone)
+        resp = await _http().post(
+            f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json",
+            auth=(account_sid, auth_token),
+            data={"From": twilio_phone, "To": your_phone, "Body": f"[LOGIA Reroute] {message}"},
+        )
+        resp.raise_for_status()
         return "Passenger notification successfully sent via Twilio."
     except Exception as e:
-        return f"Error sending Twilio notification: {e}"    
+        return f"Error sending Twilio notification: {e}"
 
 # Define Pydantic models for structured tool inputs
 class AlternativeDestinationsInput(BaseModel):
@@ -97,11 +200,7 @@ class FareCalculatorInput(BaseModel):
 # ==============================================================================
 class LangChainReroutingAgent:
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest",
-            google_api_key=os.environ.get("GEMINI_API_KEY"),
-            temperature=0.0,
-        )
+        self.llm = _llm()
 
     async def _extract_query_and_location(self, scenario: str) -> tuple[str, str]:
         
@@ -117,35 +216,42 @@ class LangChainReroutingAgent:
         ai_message = await self.llm.ainvoke(prompt)
         content = getattr(ai_message, "content", "") or "{}"
         try:
-            data = json.loads(content)
+            data = orjson.loads(content)
         except Exception:
             # Try to recover a JSON object if the model added extra text
-            match = re.search(r"\{[\s\S]*\}", content)
-            data = json.loads(match.group(0)) if match else {"query": "", "location_hint": ""}
+            match = _JSON_RE.search(content)
+            data = orjson.loads(match.group(0)) if match else {"query": "", "location_hint": ""}
         query = (data.get("query") or "").strip()
         location_hint = (data.get("location_hint") or "").strip()
         return query, location_hint
 
     @staticmethod
-    def _parse_alternatives(result_text: str):
+    def _safe_float(value) -> float:
         try:
-            return ast.literal_eval(result_text)
+            return float(value or 0)
         except Exception:
-            return []
+            return 0.0
 
     @staticmethod
     def _choose_best(alternatives):
-        def rating_of(item):
-            try:
-                return float(item.get("rating", 0) or 0)
-            except Exception:
-                return 0.0
-        return max(alternatives, key=rating_of) if alternatives else None
+        """Picks the highest-rated alternative via a single vectorized argmax.
+
+        Ratings are pulled into one float32 array (SoA) so the reduction runs
+        in C — the Python max-with-key version scales poorly once the
+        candidate list grows past a handful of places.
+        """
+        if not alternatives:
+            return None
+        ratings = np.fromiter(
+            (LangChainReroutingAgent._safe_float(a.get("rating")) for a in alternatives),
+            dtype=np.float32, count=len(alternatives),
+        )
+        return alternatives[int(ratings.argmax())]
 
     @staticmethod
     def _extract_distance_duration(route_text: str) -> tuple[str, str]:
-        dist_match = re.search(r"Distance:\s*([^\.]+)", route_text)
-        dur_match = re.search(r"ETA:\s*([^\.]+)", route_text)
+        dist_match = _DIST_RE.search(route_text)
+        dur_match = _DUR_RE.search(route_text)
         distance_text = dist_match.group(1).strip() if dist_match else ""
         duration_text = dur_match.group(1).strip() if dur_match else ""
         return distance_text, duration_text
@@ -171,7 +277,8 @@ class LangChainReroutingAgent:
             reasoning_log = []
             def log(step: str):
                 reasoning_log.append(step)
-                print(f"[LOGIA REASONING] {step}")
+                if _VERBOSE:
+                    print(f"[LOGIA REASONING] {step}")
 
             log("Start reroute flow")
             log(f"Scenario: {scenario}")
@@ -182,9 +289,8 @@ class LangChainReroutingAgent:
             if not query or not location_hint:
                 return "Could not understand scenario. Please provide the place and approximate location."
 
-            # 2) Find alternatives via tool
-            alt_text = find_alternative_destinations(query=query, location_hint=location_hint)
-            all_found_locations = self._parse_alternatives(alt_text)
+            # 2) Find alternatives via tool (returns structured data directly)
+            all_found_locations = await find_alternative_destinations(query=query, location_hint=location_hint)
             log(f"find_alternative_destinations -> Found {len(all_found_locations)} locations: {all_found_locations}")
 
             # ==================================================================
@@ -197,12 +303,21 @@ class LangChainReroutingAgent:
             log(f"Chosen best alternative -> {best}")
             
             if not best:
-                notify_passenger_via_twilio(message=f"Sorry, we couldn't find a suitable alternative for '{query}' near '{location_hint}'.")
+                await notify_passenger_via_twilio(message=f"Sorry, we couldn't find a suitable alternative for '{query}' near '{location_hint}'.")
                 return "No suitable alternative destinations found nearby."
 
-            # 3) Get route details
+            # 3) Get route details — launched as a task so the locations text
+            # below is formatted while the Directions API call is in flight.
             destination_address = best.get("address", "")
-            route_text = get_new_route_details(origin_hint=location_hint, destination_address=destination_address)
+            route_task = asyncio.create_task(get_new_route_details(origin_hint=location_hint, destination_address=destination_address))
+
+            # ==================================================================
+            # ✨ FIX 2: Show all alternatives in the final output ✨
+            # Call the simplified formatting function on the complete list.
+            # ==================================================================
+            all_locations_text = self._format_all_found_locations(locations=all_found_locations, max_items=3)
+
+            route_text = await route_task
             log(f"get_new_route_details -> {route_text}")
             distance_text, duration_text = self._extract_distance_duration(route_text)
             log(f"Parsed route -> distance='{distance_text}', duration='{duration_text}'")
@@ -211,19 +326,13 @@ class LangChainReroutingAgent:
             fare_text = calculate_new_fare(distance_text=distance_text, duration_text=duration_text)
             log(f"calculate_new_fare -> {fare_text}")
 
-            # ==================================================================
-            # ✨ FIX 2: Show all alternatives in the final output ✨
-            # Call the simplified formatting function on the complete list.
-            # ==================================================================
-            all_locations_text = self._format_all_found_locations(locations=all_found_locations, max_items=3)
-
             # 5) Notify passenger
             message = (
                 f"Proposed reroute to {best.get('name')} ({destination_address}). "
                 f"ETA: {duration_text}. Distance: {distance_text}. {fare_text} "
                 f"All found locations nearby: {all_locations_text}"
             )
-            notify_result = notify_passenger_via_twilio(message=message)
+            notify_result = await notify_passenger_via_twilio(message=message)
             log(f"notify_passenger_via_twilio -> {notify_result}")
 
             # 6) Final answer
@@ -261,13 +370,18 @@ class ReroutingMCP_Server:
         if method == "initialize": result = self.mcp_initialize(params)
         elif method == "tools/list": result = self.mcp_tools_list(params)
         elif method == "tools/call": result = await self.mcp_tools_call(params)
-        return JSONResponse({"jsonrpc": "2.0", "id": request_id, "result": result})
+        # Serialize the envelope ourselves and return raw bytes — this skips
+        # FastAPI's response-model/jsonable_encoder reflection on the hot path.
+        payload = orjson.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+        return Response(content=payload, media_type="application/json")
 
 # --- Main Application Setup ---
 if __name__ == "__main__":
     print("🚕 LOGIA Cab Rerouting Agent (MCP Server) Starting...")
     mcp_server = ReroutingMCP_Server()
-    app = FastAPI(title="LOGIA Rerouting Agent")
+    app = FastAPI(title="LOGIA Rerouting Agent", default_response_class=ORJSONResponse)
     @app.post("/")
     async def rpc_endpoint(request: Request): return await mcp_server.handle_rpc_request(request)
-    uvicorn.run(app, host="127.0.0.1", port=8003)
\ No newline at end of file
+    @app.on_event("shutdown")
+    async def shutdown_http(): await _close_http()
+    uvicorn.run(app, host="127.0.0.1", port=8003, loop="uvloop", http="httptools", access_log=False, log_level="warning")
\ No newline at end of file
@@ -1,6 +1,7 @@
+import io
+
 import streamlit as st
 import requests
-import time
 
 # ==============================================================================
 # --- PAGE CONFIGURATION ---
@@ -142,24 +143,32 @@ st.markdown("""
 # --- HELPER FUNCTIONS ---
 # ==============================================================================
 
+@st.cache_resource
+def _http_session() -> requests.Session:
+    """One keep-alive session for the whole app instead of a new TCP connection per call."""
+    return requests.Session()
+
 def analyze_safety_audio(audio_bytes: bytes, filename: str):
     try:
-        files = {"audio": (filename, audio_bytes, "audio/wav")}
-        response = requests.post("http://localhost:8000/process-audio", files=files, timeout=30)
+        # Wrapping in BytesIO lets requests stream the upload in chunks
+        # instead of copying the whole clip into the request body at once.
+        files = {"audio": (filename, io.BytesIO(audio_bytes), "audio/wav")}
+        response = _http_session().post("http://localhost:8000/process-audio", files=files, timeout=30)
         return response.json()
     except Exception as e:
         return {"error": f"Failed to connect to Host for safety analysis: {e}"}
 
 def resolve_disruption_with_router(text_scenario: str):
     try:
-        response = requests.post("http://localhost:8000/resolve-disruption", json={"scenario": text_scenario}, timeout=60)
+        response = _http_session().post("http://localhost:8000/resolve-disruption", json={"scenario": text_scenario}, timeout=60)
         return response.json()
     except Exception as e:
         return {"error": f"Failed to connect to Host for routing: {e}"}
 
+@st.cache_data(ttl=5, show_spinner=False)
 def check_system_status():
     try:
-        response = requests.get("http://localhost:8000/status", timeout=3)
+        response = _http_session().get("http://localhost:8000/status", timeout=3)
         response.raise_for_status()
         return True, response.json()
     except requests.exceptions.RequestException:
@@ -218,7 +227,6 @@ with col_left:
         if resolve_button:
             if scenario:
                 with st.spinner("🔍 AI Coordinator analyzing scenario..."):
-                    time.sleep(0.5)  # Visual feedback
                     st.session_state.result = resolve_disruption_with_router(scenario)
                     st.session_state.result_type = "disruption"
             else:
@@ -243,8 +251,11 @@ with col_right:
         )
         
         if uploaded_file:
+            # Materialize the upload once — getvalue() copies the whole buffer.
+            audio_bytes = uploaded_file.getvalue()
+
             # File info
-            file_size = len(uploaded_file.getvalue()) / 1024  # KB
+            file_size = len(audio_bytes) / 1024  # KB
             st.info(f"📁 **File:** {uploaded_file.name} ({file_size:.1f} KB)")
             
             col_analyze, col_clear = st.columns([2, 1])
@@ -256,8 +267,7 @@ with col_right:
             
             if analyze_button:
                 with st.spinner("🛡️ Analyzing audio for safety threats..."):
-                    time.sleep(0.5)  # Visual feedback
-                    st.session_state.result = analyze_safety_audio(uploaded_file.getvalue(), uploaded_file.name)
+                    st.session_state.result = analyze_safety_audio(audio_bytes, uploaded_file.name)
                     st.session_state.result_type = "safety"
 
 # Results Section
@@ -330,10 +340,8 @@ if 'result' in st.session_state:
 
 with st.sidebar:
     st.markdown("### 🔧 System Dashboard")
-    
-    # System Status
-    system_online, status_data = check_system_status()
-    
+
+    # System Status (reuses the banner's check — one /status call per render)
     if system_online:
         st.markdown('<p class="status-online">🟢 MCP Host: ONLINE</p>', unsafe_allow_html=True)
         
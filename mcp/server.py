@@ -1,17 +1,24 @@
 import uvicorn
 import httpx
-import base64
+import asyncio
 from fastapi import FastAPI, UploadFile, File, HTTPException, Body
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 from typing import Dict, Any
 from datetime import datetime
 import uvicorn
 import httpx
-import base64
 import os  # Import the os module
 from dotenv import load_dotenv  # Import the load_dotenv function
 from twilio.rest import Client
 import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+import re
+import redis.asyncio as aioredis
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import Tool, create_react_agent, AgentExecutor
@@ -19,12 +26,41 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
 
 load_dotenv()
+
+# Per-RPC tracing goes through logging so it is free unless enabled.
+# Set LOGIA_VERBOSE=1 to see tool-call progress lines.
+logger = logging.getLogger(__name__)
+if os.environ.get("LOGIA_VERBOSE") == "1":
+    logging.basicConfig(level=logging.DEBUG)
+
 # ==============================================================================
 # 1. CONFIGURATION
 # ==============================================================================
 # All your agent (MCP Server) addresses will go here.
 SAFETY_SERVER_URL = "http://localhost:8001"
 
+# Uploads past this are rejected with 413 before any memory or CPU is spent
+# on them (the dashboard advertises a 10 MB limit).
+MAX_AUDIO_BYTES = 10 * 1024 * 1024
+
+# Speculative routing fires every text specialist before the LLM router has
+# decided. Cancelling the host-side task does NOT stop a specialist server
+# that is already running — the current specialists send real Twilio SMS, so
+# every ambiguous request would text the user twice. Off unless explicitly
+# enabled on a deployment whose specialists are side-effect-free.
+SPECULATIVE_ROUTING = os.environ.get("LOGIA_SPECULATIVE_ROUTING") == "1"
+
+def _load_server_configs() -> list:
+    """Parses servers.json once at import instead of on every startup pass."""
+    try:
+        with open("servers.json", 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print("🔥 servers.json not found. No specialist agents will be connected.")
+        return []
+
+SERVER_CONFIGS = _load_server_configs()
+
 
 # ==============================================================================
 # 2. GLOBAL STATE FOR THE HOST
@@ -35,7 +71,18 @@ TOOL_REGISTRY: Dict[str, 'MCPClient'] = {}
 safety_agent_client = None
 router_agent_executor = None
 
-# In-memory status tracking for the dashboard.
+# One Twilio client for the process: the SDK keeps a pooled requests.Session
+# underneath, so each alert reuses a warm TLS connection to api.twilio.com
+# instead of paying a fresh handshake per HIGH threat.
+TWILIO_FROM = os.environ.get("TWILIO_PHONE_NUMBER")
+TWILIO_TO = os.environ.get("YOUR_PHONE_NUMBER")
+_twilio_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+_twilio_token = os.environ.get("TWILIO_AUTH_TOKEN")
+TWILIO_CLIENT = Client(_twilio_sid, _twilio_token) if all([_twilio_sid, _twilio_token, TWILIO_FROM, TWILIO_TO]) else None
+
+# In-memory status tracking for the dashboard. With multiple workers each
+# process would hold a divergent copy, so when Redis is reachable it becomes
+# the source of truth and this dict is only the single-worker fallback.
 current_status = {
     "last_recognized_text": "",
     "threat_level": "SAFE",
@@ -43,6 +90,44 @@ current_status = {
     "active_alerts": 0
 }
 
+_STATUS_KEY = "host:status"
+
+async def get_status_snapshot() -> dict:
+    """Returns the dashboard status, preferring the shared Redis hash."""
+    r = app.state.redis
+    if r is not None:
+        try:
+            data = await r.hgetall(_STATUS_KEY)
+            return {
+                "last_recognized_text": data.get("last_recognized_text", ""),
+                "threat_level": data.get("threat_level", "SAFE"),
+                "last_update": data.get("last_update") or None,
+                "active_alerts": int(data.get("active_alerts", 0)),
+            }
+        except Exception as e:
+            logger.error("❌ Redis status read failed: %s", e)
+    return dict(current_status)
+
+async def update_status(recognized_text: str, alert_level: str, new_alert: bool):
+    """Records the latest analysis in Redis (one HSET) or the local dict."""
+    current_status["threat_level"] = alert_level
+    current_status["last_recognized_text"] = recognized_text
+    current_status["last_update"] = datetime.now().isoformat()
+    if new_alert:
+        current_status["active_alerts"] += 1
+    r = app.state.redis
+    if r is not None:
+        try:
+            await r.hset(_STATUS_KEY, mapping={
+                "threat_level": alert_level,
+                "last_recognized_text": recognized_text,
+                "last_update": current_status["last_update"],
+            })
+            if new_alert:
+                await r.hincrby(_STATUS_KEY, "active_alerts", 1)
+        except Exception as e:
+            logger.error("❌ Redis status write failed: %s", e)
+
 
 # ==============================================================================
 # 3. MCP HELPER CLASS
@@ -60,9 +145,14 @@ class MCPClient:
         try:
             response = await self.client.post("/", json=payload)
             response.raise_for_status()
-            return response.json()
-        except httpx.RequestError as e:
-            print(f"❌ Could not communicate with {self.name}: {e}")
+            # orjson parses the raw bytes directly — faster than response.json()
+            # and skips httpx's charset detection pass.
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            # HTTPError covers both transport failures (RequestError) and
+            # raise_for_status (HTTPStatusError); JSONDecodeError covers a
+            # server that replied with a non-JSON body.
+            logger.error("❌ Could not communicate with %s: %s", self.name, e)
             return {"error": {"message": str(e)}}
 
     async def initialize(self) -> bool:
@@ -83,10 +173,102 @@ class MCPClient:
             return self.tools
         return []
 
-    async def call_tool(self, tool_name: str, arguments: Dict) -> Dict[str, Any]:
-        print(f"🚀 Calling tool '{tool_name}' on {self.name}...")
+    async def call_tool(self, tool_name: str, arguments: Dict, binary_parts: Dict[str, bytes] = None) -> Dict[str, Any]:
+        logger.debug("🚀 Calling tool '%s' on %s...", tool_name, self.name)
+        if binary_parts:
+            return await self._send_multipart_request(tool_name, arguments, binary_parts)
         return await self._send_request("tools/call", {"name": tool_name, "arguments": arguments})
-    
+
+    async def _send_multipart_request(self, tool_name: str, arguments: Dict, binary_parts: Dict[str, bytes]) -> Dict[str, Any]:
+        # HTTP bodies are already binary-safe, so base64 exists here only to
+        # tunnel bytes through a JSON field. Multipart ships the raw bytes
+        # instead: no encode/decode pass and no 33% size inflation.
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": tool_name, "arguments": arguments}}
+        files = {name: (name, data, "application/octet-stream") for name, data in binary_parts.items()}
+        try:
+            response = await self.client.post("/rpc-multipart", data={"payload": orjson.dumps(payload).decode()}, files=files)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            logger.error("❌ Could not communicate with %s: %s", self.name, e)
+            return {"error": {"message": str(e)}}
+
+
+class AsyncBatcher:
+    """Coalesces concurrent audio analyses into one batched RPC.
+
+    Arrivals inside a 50 ms window ride a single safety/analyzeAudioBatch
+    call instead of N independent HTTP round trips — the dominant cost in a
+    burst of uploads. The window is also the worst-case latency a lone
+    request pays for the privilege.
+    """
+    def __init__(self, window_ms: float = 50.0, max_batch: int = 8):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_task = None
+
+    async def analyze(self, tool_client: 'MCPClient', audio_bytes: bytes) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((audio_bytes, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush(tool_client)
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window(tool_client))
+        return await future
+
+    async def _flush_after_window(self, tool_client: 'MCPClient'):
+        await asyncio.sleep(self.window)
+        self._flush(tool_client)
+
+    def _flush(self, tool_client: 'MCPClient'):
+        pending, self._pending = self._pending, []
+        timer, self._flush_task = self._flush_task, None
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        if pending:
+            asyncio.create_task(self._run_batch(tool_client, pending))
+
+    async def _run_batch(self, tool_client: 'MCPClient', pending: list):
+        # This task is fire-and-forget: anything that escapes it (HTTP status
+        # errors, a malformed response body) would otherwise leave every
+        # coalesced caller awaiting a future that never resolves. Convert any
+        # failure into an error envelope so callers get their 500 immediately.
+        try:
+            binary_parts = {f"item_{i}": clip for i, (clip, _) in enumerate(pending)}
+            response = await tool_client.call_tool(
+                "safety/analyzeAudioBatch", {"count": len(pending), "encoding": "binary"}, binary_parts=binary_parts
+            )
+        except Exception as e:
+            logger.error("❌ Batched safety RPC failed: %s", e)
+            response = {"error": {"message": str(e)}}
+        contents = response.get("result", {}).get("content", [])
+        for i, (_, future) in enumerate(pending):
+            if future.done():
+                continue
+            if "error" in response:
+                future.set_result(response)
+            else:
+                # Re-wrap as a single-call envelope so callers are agnostic
+                # to whether their clip travelled alone or in a batch.
+                content = contents[i] if i < len(contents) else {}
+                future.set_result({"result": {"content": [content]}})
+
+AUDIO_BATCHER = AsyncBatcher()
+
+
+# The router prompt never changes between requests, so it is compiled into a
+# PromptTemplate exactly once at import; each request only substitutes
+# {input} instead of re-parsing the template text.
+ROUTER_PROMPT = PromptTemplate.from_template(
+    """You are an expert logistics dispatcher. Analyze the user's problem and decide which department is best suited to handle it. The available departments are 'safety_agent', 'food_delay_agent', and 'cab_rerouting_agent'.
+
+    User's Problem: "{input}"
+
+    Based on the problem, choose the single most appropriate department.
+    """
+)
+
 def create_router_agent():
     """
     Initializes a highly efficient LLM router that uses structured output
@@ -108,17 +290,53 @@ def create_router_agent():
     # 2. Bind this structure to the LLM to force its output into our desired format.
     structured_llm = llm.with_structured_output(RouterChoice)
 
-    # 3. Create a much simpler prompt for direct classification.
-    prompt_template = """You are an expert logistics dispatcher. Analyze the user's problem and decide which department is best suited to handle it. The available departments are 'safety_agent', 'food_delay_agent', and 'cab_rerouting_agent'.
+    # 3. Create the final, simple chain from the precompiled module-level
+    # prompt. This is not an agent, just a direct sequence.
+    return ROUTER_PROMPT | structured_llm
 
-    User's Problem: "{input}"
-    
-    Based on the problem, choose the single most appropriate department.
+
+# Fast-path routing: most demo scenarios contain an unambiguous keyword, and a
+# compiled regex match costs microseconds versus a full Gemini round trip.
+# The LLM router is only consulted for scenarios these rules cannot place.
+ROUTE_RULES = [
+    (re.compile(r"\b(late|delivery|eta|food)\b", re.IGNORECASE), "food_delay_agent"),
+    (re.compile(r"\b(cab|driver|route)\b", re.IGNORECASE), "cab_rerouting_agent"),
+    (re.compile(r"\b(help|danger|scared)\b", re.IGNORECASE), "safety_agent"),
+]
+
+def route_by_keywords(scenario: str):
+    """Returns an agent name only if exactly one rule matches, else None.
+
+    Every rule is evaluated: a scenario that trips rules for two different
+    agents ("Help, my driver is scaring me" matches both cab and safety) is
+    ambiguous, and first-match ordering would quietly pick whichever rule
+    happens to come first. Ambiguous scenarios are left to the LLM router.
     """
-    prompt = PromptTemplate.from_template(prompt_template)
+    matched = {agent_name for pattern, agent_name in ROUTE_RULES if pattern.search(scenario)}
+    if len(matched) == 1:
+        return matched.pop()
+    return None
+
+# Agent name → MCP tool name. None means the agent takes no text scenario
+# (safety needs audio). One hash lookup replaces the substring-scan if/elif
+# chain, and an unknown agent name now fails loudly instead of silently
+# returning an empty result.
+AGENT_DISPATCH = {
+    "food_delay_agent": "food/resolveDelay",
+    "cab_rerouting_agent": "cab/rerouteRequest",
+    "safety_agent": None,
+}
+
+def _extract_content(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Pulls the first content item (the final answer) out of a tool response."""
+    return response.get("result", {}).get("content", [{}])[0]
 
-    # 4. Create the final, simple chain. This is not an agent, just a direct sequence.
-    return prompt | structured_llm
+async def _call_specialist(tool_name: str, scenario: str) -> Dict[str, Any]:
+    """Calls a specialist tool by name and extracts its final answer."""
+    client = TOOL_REGISTRY.get(tool_name)
+    if not client:
+        return {"error": f"No connected agent provides '{tool_name}'. Check servers.json and agent status."}
+    return _extract_content(await client.call_tool(tool_name, {"scenario": scenario}))
 
 
 
@@ -127,45 +345,61 @@ def create_router_agent():
 # ==============================================================================
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Request handlers log through an in-memory queue; a background listener
+    # thread does the actual stdout writes, so under concurrent load handlers
+    # never serialize on the stdout lock.
+    log_queue = queue.Queue(-1)
+    log_listener = QueueListener(log_queue, logging.StreamHandler())
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    if root_logger.level > logging.INFO:
+        root_logger.setLevel(logging.INFO)
+    log_listener.start()
+
     print("🚀 LOGIA MCP Host is starting up...")
     global safety_agent_client, router_agent_executor
+
+    # Shared status store so all uvicorn workers report one consistent view.
+    # When Redis is unreachable we degrade to the in-process dict, which is
+    # correct for single-worker runs.
+    app.state.redis = None
+    try:
+        r = aioredis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+        await r.ping()
+        app.state.redis = r
+        print("✅ Status store backed by Redis.")
+    except Exception as e:
+        print(f"⚠️ Redis unavailable ({e}); using in-process status store.")
     
     # On startup, create a client for our Safety Agent
     safety_agent_client = MCPClient("SafetyServer", SAFETY_SERVER_URL)
-    
-    # Perform the MCP handshake and discover tools
-    if await safety_agent_client.initialize():
-        tools = await safety_agent_client.list_tools()
-        for tool in tools:
-            TOOL_REGISTRY[tool['name']] = safety_agent_client
-            print(f"  - Registered tool '{tool['name']}'")
 
-    print("\n--- Connecting to Specialist Agents listed in servers.json ---")
-    try:
-        with open("servers.json", 'r') as f:
-            server_configs = json.load(f)
-    except FileNotFoundError:
-        print("🔥 servers.json not found. No specialist agents will be connected.")
-        server_configs = []
-
-    for config in server_configs:
+    print("\n--- Connecting to agents (servers.json + Safety Server) in parallel ---")
+    clients = [safety_agent_client]
+    for config in SERVER_CONFIGS:
         if not config.get("enabled"):
             continue
+        clients.append(MCPClient(config["name"], config["address"]))
 
-        name = config["name"]
-        address = config["address"]
-        
-        # Create a client for each agent in the config file
-        client = MCPClient(name, address)
-        
-        # Perform the MCP handshake and discover its tools
+    async def _bootstrap(client: MCPClient) -> list:
+        """Handshake + tool discovery for one agent."""
         if await client.initialize():
-            tools = await client.list_tools()
-            for tool in tools:
-                tool_name = tool.get('name')
-                if tool_name:
-                    TOOL_REGISTRY[tool_name] = client
-                    print(f"  - Registered tool '{tool_name}' from {name}")
+            return await client.list_tools()
+        return []
+
+    # Each handshake is dominated by network wait, so running them
+    # concurrently makes startup as slow as the slowest agent, not the sum.
+    # return_exceptions keeps one dead agent from blocking the rest.
+    results = await asyncio.gather(*(_bootstrap(c) for c in clients), return_exceptions=True)
+    for client, tools in zip(clients, results):
+        if isinstance(tools, BaseException):
+            print(f"🔥 Bootstrap failed for {client.name}: {tools}")
+            continue
+        for tool in tools:
+            tool_name = tool.get('name')
+            if tool_name:
+                TOOL_REGISTRY[tool_name] = client
+                print(f"  - Registered tool '{tool_name}' from {client.name}")
     print("----------------------------------------------------------")
     # --- END OF NEW LOGIC ---
      # --- NEW: Initialize the Router Agent on startup ---
@@ -179,12 +413,20 @@ async def lifespan(app: FastAPI):
 
     yield
     print("👋 LOGIA MCP Host is shutting down.")
+    if app.state.redis is not None:
+        await app.state.redis.aclose()
+    log_listener.stop()
 
 
 # ==============================================================================
 # 5. FASTAPI APPLICATION AND ENDPOINTS
 # ==============================================================================
-app = FastAPI(title="LOGIA MCP Host (Single File)", lifespan=lifespan)
+# Every endpoint returns a dict; orjson's encoder is several times faster
+# than the stdlib serializer FastAPI uses by default.
+app = FastAPI(title="LOGIA MCP Host (Single File)", lifespan=lifespan, default_response_class=ORJSONResponse)
+# Compress larger JSON responses (transcripts, tool registries); payloads
+# under 1 KB ship as-is since the gzip header would eat the saving.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 @app.get("/")
 async def root():
@@ -197,12 +439,13 @@ async def root():
 @app.get("/status")
 async def get_status():
     """Provides the live dashboard status of the Host."""
+    status = await get_status_snapshot()
     return {
         "host_dashboard": {
-            "current_threat_level": current_status["threat_level"],
-            "last_recognized_text": current_status["last_recognized_text"],
-            "active_alerts_today": current_status["active_alerts"],
-            "last_status_update": current_status["last_update"]
+            "current_threat_level": status["threat_level"],
+            "last_recognized_text": status["last_recognized_text"],
+            "active_alerts_today": status["active_alerts"],
+            "last_status_update": status["last_update"]
         },
         "registered_tools": list(TOOL_REGISTRY.keys())
     }
@@ -214,22 +457,31 @@ async def process_audio(audio: UploadFile = File(...)):
     """
     tool_name = "safety/analyzeAudio"
     
-    client = TOOL_REGISTRY.get(tool_name)
-    if not client:
+    # Named tool_client (not `client`) so nothing can shadow it with an
+    # unrelated SDK client later in the handler.
+    tool_client = TOOL_REGISTRY.get(tool_name)
+    if not tool_client:
         raise HTTPException(status_code=501, detail=f"No server found that provides the tool '{tool_name}'")
 
-    audio_bytes = await audio.read()
-    audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-    arguments = {
-        "audio_data": audio_base64,
-        "encoding": "base64",
-        "file_format": audio.content_type
-    }
-
-    result = await client.call_tool(tool_name, arguments)
+    # Reject oversized uploads before reading a byte of them.
+    if audio.size and audio.size > MAX_AUDIO_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio upload exceeds the {MAX_AUDIO_BYTES // (1024 * 1024)} MB limit.")
+
+    # The audio rides the multipart body as raw bytes — no base64 encode here,
+    # no decode on the safety server, no 33% wire inflation. Concurrent
+    # uploads inside the batcher's window share one batched RPC. The chunked
+    # read keeps a running count so a client that understates Content-Length
+    # still can't balloon memory.
+    buf = bytearray()
+    while chunk := await audio.read(64 * 1024):
+        buf.extend(chunk)
+        if len(buf) > MAX_AUDIO_BYTES:
+            raise HTTPException(status_code=413, detail=f"Audio upload exceeds the {MAX_AUDIO_BYTES // (1024 * 1024)} MB limit.")
+    audio_bytes = bytes(buf)
+    result = await AUDIO_BATCHER.analyze(tool_client, audio_bytes)
 
     if "error" in result:
-        raise HTTPException(status_code=500, detail=f"Error from {client.name}: {result['error']['message']}")
+        raise HTTPException(status_code=500, detail=f"Error from {tool_client.name}: {result['error']['message']}")
     
     # --- ACTION LOGIC STARTS HERE ---
     final_result_data = {}
@@ -240,96 +492,111 @@ async def process_audio(audio: UploadFile = File(...)):
         alert_level = final_result_data.get("alert_level", "UNKNOWN")
         recognized_text = final_result_data.get("recognized_text", "")
         
-        current_status["threat_level"] = alert_level
-        current_status["last_recognized_text"] = recognized_text
-        current_status["last_update"] = datetime.now().isoformat()
-        
-        print(f"✅ Analysis complete. Text: '{recognized_text}' | Level: {alert_level}")
+        await update_status(recognized_text, alert_level, new_alert=(alert_level == "HIGH"))
+
+        logger.info("✅ Analysis complete. Text: '%s' | Level: %s", recognized_text, alert_level)
 
         if alert_level == "HIGH":
-            current_status["active_alerts"] += 1
-            print("="*40)
-            print(f"🚨🚨 HIGH THREAT ALERT DETECTED! 🚨🚨")
-            print(f"   Recognized Text: '{recognized_text}'")
-            print(f"   Matched Words: {final_result_data.get('matched_words')}")
-            print("="*40)
+            logger.info("=" * 40)
+            logger.info("🚨🚨 HIGH THREAT ALERT DETECTED! 🚨🚨")
+            logger.info("   Recognized Text: '%s'", recognized_text)
+            logger.info("   Matched Words: %s", final_result_data.get('matched_words'))
+            logger.info("=" * 40)
 
               # ==========================================================
             # SECURE PROTOTYPE ACTION: SEND AN SMS WITH TWILIO
             # ==========================================================
             try:
-                # Read credentials securely from the environment
-                account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
-                auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
-                twilio_phone = os.environ.get("TWilio_PHONE_NUMBER")
-                your_phone = os.environ.get("YOUR_PHONE_NUMBER")
-
-                # Check if the variables were loaded correctly
-                if not all([account_sid, auth_token, twilio_phone, your_phone]):
-                    print(" T_WARNING: Twilio environment variables not set. Skipping SMS alert.")
+                if TWILIO_CLIENT is None:
+                    logger.warning("T_WARNING: Twilio environment variables not set. Skipping SMS alert.")
                 else:
-                    client = Client(account_sid, auth_token)
                     message_body = (
                         f"CRITICAL SAFETY ALERT from LOGIA!\n"
                         f"Threat Level: HIGH\n"
                         f"Detected Phrase: '{recognized_text}'\n"
                         f"Location: [Prototype Location]"
                     )
-                    
-                    message = client.messages.create(
+
+                    # The SMS is a side effect — fire it from a worker thread
+                    # instead of holding the HTTP response hostage to a
+                    # 300-800ms synchronous Twilio round trip.
+                    asyncio.create_task(asyncio.to_thread(
+                        TWILIO_CLIENT.messages.create,
                         body=message_body,
-                        from_=twilio_phone,
-                        to=your_phone
-                    )
-                    print(f"✅ Successfully sent SMS alert via Twilio! SID: {message.sid}")
+                        from_=TWILIO_FROM,
+                        to=TWILIO_TO
+                    ))
+                    logger.info("✅ SMS alert dispatched via Twilio in the background.")
 
             except Exception as e:
-                print(f"🔥 FAILED to send SMS alert: {e}")
+                logger.error("🔥 FAILED to send SMS alert: %s", e)
     # --- ACTION LOGIC ENDS HERE ---
-        
-    return final_result_data
+
+    # Pre-serialized pass-through: returning a plain dict would send it
+    # through FastAPI's jsonable_encoder walk before re-encoding. One direct
+    # orjson.dumps skips that traversal for what is an as-is relay of the
+    # safety server's payload.
+    return Response(content=orjson.dumps(final_result_data), media_type="application/json")
 
 
 
 @app.post("/resolve-disruption")
 async def resolve_disruption(scenario: str = Body(..., embed=True)):
-    if not router_agent_executor:
-        raise HTTPException(status_code=503, detail="Router Agent is initializing or failed. Please try again.")
-
+    speculative = {}
     try:
-        print(f"🧠 Router received scenario: '{scenario}'. Invoking Gemini for a direct choice...")
-        router_response_object = await router_agent_executor.ainvoke({"input": scenario})
-        chosen_agent_name = router_response_object.agent_name
-
-        router_reasoning = f"Input: '{scenario}'\nLLM Analysis: The user's problem is about '{chosen_agent_name}'.\nDecision: Routing to the {chosen_agent_name}."
-        print(f"✅ Router decision: {chosen_agent_name}")
-
-        specialist_result = {}
-
-        
-        if "food_delay_agent" in chosen_agent_name:
-            client = TOOL_REGISTRY.get("food/resolveDelay")
-            if client:
-                # Call the real agent and get its response
-                specialist_response = await client.call_tool("food/resolveDelay", {"scenario": scenario})
-                # Extract the final answer from the agent's response
-                specialist_result = specialist_response.get("result", {}).get("content", [{}])[0]
-            else:
-                specialist_result = {"error": "Food Delay Agent is not connected. Check servers.json and agent status."}
-
-        elif "cab_rerouting_agent" in chosen_agent_name:
-            client = TOOL_REGISTRY.get("cab/rerouteRequest")
-            if client:
-             specialist_response = await client.call_tool("cab/rerouteRequest", {"scenario": scenario})
-             specialist_result = specialist_response.get("result", {}).get("content", [{}])[0]
-            else:
-             specialist_result = {"error": "Cab Rerouting Agent is not connected."}
-
-        elif "safety_agent" in chosen_agent_name:
+        # Try the keyword fast path first — no LLM call for obvious scenarios.
+        chosen_agent_name = route_by_keywords(scenario)
+        if chosen_agent_name:
+            router_reasoning = f"Input: '{scenario}'\nKeyword Analysis: Matched a routing rule for '{chosen_agent_name}'.\nDecision: Routing to the {chosen_agent_name} (LLM skipped)."
+            logger.info("⚡ Keyword router decision: %s", chosen_agent_name)
+        else:
+            if not router_agent_executor:
+                raise HTTPException(status_code=503, detail="Router Agent is initializing or failed. Please try again.")
+            logger.info("🧠 Router received scenario: '%s'. Invoking Gemini for a direct choice...", scenario)
+
+            # Speculative execution: fire every connected text specialist
+            # while the router is thinking. The router's round trip and the
+            # winner's then overlap instead of running back to back; losers
+            # are cancelled the moment the decision lands. Cancellation only
+            # abandons the HTTP call — the losing specialists still run to
+            # completion server-side, so this is opt-in (SPECULATIVE_ROUTING)
+            # and only safe when the specialists have no side effects.
+            if SPECULATIVE_ROUTING:
+                for agent_name, tool in AGENT_DISPATCH.items():
+                    if tool is None:
+                        continue
+                    spec_client = TOOL_REGISTRY.get(tool)
+                    if spec_client:
+                        speculative[agent_name] = asyncio.create_task(spec_client.call_tool(tool, {"scenario": scenario}))
+
+            router_response_object = await router_agent_executor.ainvoke({"input": scenario})
+            chosen_agent_name = router_response_object.agent_name
+            for agent_name, task in speculative.items():
+                if agent_name != chosen_agent_name:
+                    task.cancel()
+
+            router_reasoning = f"Input: '{scenario}'\nLLM Analysis: The user's problem is about '{chosen_agent_name}'.\nDecision: Routing to the {chosen_agent_name}."
+            logger.info("✅ Router decision: %s", chosen_agent_name)
+
+        if chosen_agent_name not in AGENT_DISPATCH:
+            specialist_result = {"error": f"Router chose unknown agent '{chosen_agent_name}'."}
+        elif AGENT_DISPATCH[chosen_agent_name] is None:
             specialist_result = {"action": "Routing to Safety Agent.", "details": "This requires audio input via the Safety Alert section."}
-
+        elif (spec_task := speculative.get(chosen_agent_name)) is not None:
+            # The winning specialist was pre-launched — its result is already
+            # here or in flight.
+            specialist_result = _extract_content(await spec_task)
+        else:
+            specialist_result = await _call_specialist(AGENT_DISPATCH[chosen_agent_name], scenario)
+
+    except HTTPException:
+        for task in speculative.values():
+            task.cancel()
+        raise
     except Exception as e:
-        print(f"🔥🔥🔥 LLM ROUTING FAILED 🔥🔥🔥\nError: {e}")
+        for task in speculative.values():
+            task.cancel()
+        logger.error("🔥🔥🔥 LLM ROUTING FAILED 🔥🔥🔥\nError: %s", e)
         raise HTTPException(status_code=500, detail=f"LLM Routing Error: {e}")
 
     return {
@@ -344,4 +611,16 @@ async def resolve_disruption(scenario: str = Body(..., embed=True)):
 # ==============================================================================
 if __name__ == "__main__":
     print("Starting LOGIA MCP Host...")
-    uvicorn.run(app, host="localhost", port=8000)
\ No newline at end of file
+    # uvloop + httptools: drop-in C implementations of the event loop and HTTP
+    # parser — the cheapest throughput win for an I/O-bound proxy like this.
+    # Every request fans out to external services, so the host scales
+    # horizontally: 2n+1 workers is the standard heuristic for I/O-bound apps.
+    # Workers need the app as an import string so each process re-imports it.
+    uvicorn.run(
+        "server:app",
+        host="localhost",
+        port=8000,
+        workers=2 * os.cpu_count() + 1,
+        loop="uvloop",
+        http="httptools",
+    )
\ No newline at end of file